@@ -0,0 +1,112 @@
+'''
+Spend and volume analytics over purchase orders.
+
+OrderVolumeCube keeps one pre-aggregated cell per vendor x month x status,
+maintained incrementally by the PurchaseOrder signals in models.py. Queries
+slice and roll up those cells instead of grouping the PurchaseOrder table.
+'''
+
+from django.db import connection, models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
+
+from .models import OrderVolumeCube, PurchaseOrder
+
+DIMENSIONS = ['vendor', 'period', 'status']
+
+GRANULARITIES = {
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+
+def query_order_volume(group_by=(), granularity='month', vendors=None, statuses=None,
+                       period_start=None, period_end=None, organization=None):
+    """
+    Roll the cube up to the group_by dimensions after slicing it by the filters.
+    Returns a list of dicts holding the grouped dimensions, order_count and total_quantity.
+    """
+    cells = OrderVolumeCube.objects.filter(order_count__gt=0)
+    if organization:
+        cells = cells.filter(vendor__organization=organization)
+    if vendors:
+        cells = cells.filter(vendor_id__in=vendors)
+    if statuses:
+        cells = cells.filter(status__in=statuses)
+    if period_start:
+        # Both bounds are month-inclusive, the cube's cells are keyed by the first day of the month
+        cells = cells.filter(period__gte=period_start.replace(day=1))
+    if period_end:
+        cells = cells.filter(period__lte=period_end)
+
+    if 'period' in group_by and granularity != 'month':
+        cells = cells.annotate(
+            rollup_period=GRANULARITIES[granularity]('period', output_field=models.DateField())
+        )
+    columns = {
+        'vendor': 'vendor_id',
+        'period': 'period' if granularity == 'month' else 'rollup_period',
+        'status': 'status',
+    }
+    fields = [columns[dimension] for dimension in DIMENSIONS if dimension in group_by]
+
+    totals = {
+        'order_count': Sum('order_count'),
+        'total_quantity': Sum('total_quantity'),
+    }
+    if fields:
+        rows = cells.values(*fields).annotate(**totals).order_by(*fields)
+    else:
+        rows = [cells.aggregate(**totals)]
+
+    return [
+        {
+            **{dimension: row[columns[dimension]] for dimension in DIMENSIONS if dimension in group_by},
+            'order_count': row['order_count'] or 0,
+            'total_quantity': row['total_quantity'] or 0,
+        }
+        for row in rows
+    ]
+
+
+def rebuild_order_volume(vendor=None, batch_size=1000):
+    """
+    Recompute the cube from scratch with a single GROUP BY over PurchaseOrder.
+    Returns the number of cells written.
+    """
+    with transaction.atomic():
+        # Writers apply their deltas after the rebuild commits, on top of it. On other databases the
+        # delete below takes the (database-wide) write lock before the orders are read.
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {connection.ops.quote_name(OrderVolumeCube._meta.db_table)} IN SHARE ROW EXCLUSIVE MODE'
+                )
+
+        orders = PurchaseOrder.objects.all()
+        stale_cells = OrderVolumeCube.objects.all()
+        if vendor:
+            orders = orders.filter(vendor_id=vendor)
+            stale_cells = stale_cells.filter(vendor_id=vendor)
+        stale_cells.delete()
+
+        rows = orders.annotate(
+            period=TruncMonth('order_date', output_field=models.DateField())
+        ).values('vendor_id', 'period', 'status').annotate(
+            order_count=Count('po_number'),
+            total_quantity=Sum('quantity'),
+        ).order_by()
+        cells = [
+            OrderVolumeCube(
+                vendor_id=row['vendor_id'],
+                period=row['period'],
+                status=row['status'],
+                order_count=row['order_count'],
+                total_quantity=row['total_quantity'] or 0,
+            )
+            for row in rows
+        ]
+        OrderVolumeCube.objects.bulk_create(cells, batch_size=batch_size)
+
+    return len(cells)
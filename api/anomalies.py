@@ -0,0 +1,79 @@
+'''
+Streaming anomaly detection over the vendor performance history.
+
+Every HistoricalPerformance snapshot is folded into an exponentially weighted
+moving average (EWMA) and variance kept per vendor and metric, so a new
+snapshot is scored in O(1) without rescanning the history. A snapshot whose
+z-score against the baseline moves past ANOMALY_Z_THRESHOLD in the "worse"
+direction of its metric is flagged.
+'''
+
+import math
+
+# Metric name -> direction in which the metric degrades (+1 rising is worse, -1 falling is worse).
+MONITORED_METRICS = {
+    'on_time_delivery_rate': -1,
+    'quality_rating_avg': -1,
+    'average_response_time': 1,
+    'fulfillment_rate': -1,
+}
+
+ANOMALY_EWMA_ALPHA = 0.3  # weight of the newest snapshot in the baseline
+ANOMALY_Z_THRESHOLD = 3.0  # flag snapshots this many standard deviations worse than the baseline
+ANOMALY_WARMUP = 5  # snapshots needed before a baseline is trusted
+ANOMALY_MIN_STDDEV = 1.0  # floor on the baseline standard deviation, in the metric's unit
+ANOMALY_MIN_RELATIVE_STDDEV = 0.05  # floor on the baseline standard deviation, as a fraction of its mean
+
+
+def baseline_stddev(mean, variance):
+    """
+    Standard deviation a snapshot is scored against. The floor keeps a flat
+    series (variance 0 or close to it) from either hiding a sharp drop or
+    flagging tiny changes.
+    """
+    return max(math.sqrt(max(variance, 0.0)), ANOMALY_MIN_STDDEV, ANOMALY_MIN_RELATIVE_STDDEV * abs(mean))
+
+
+def ewma_update(mean, variance, count, value, alpha=ANOMALY_EWMA_ALPHA, threshold=ANOMALY_Z_THRESHOLD):
+    """
+    Fold value into an EWMA baseline.
+    Returns (mean, variance, count, z_score), where z_score is the score of
+    value against the baseline *before* the update (None while warming up).
+    Values beyond the threshold are clamped to it before being folded in, so a
+    single outlier does not inflate the variance and hide the ones after it.
+    """
+    if count == 0:
+        return value, 0.0, 1, None
+
+    stddev = baseline_stddev(mean, variance)
+    z_score = (value - mean) / stddev if count >= ANOMALY_WARMUP else None
+
+    limit = threshold * stddev
+    diff = min(max(value - mean, -limit), limit)
+    increment = alpha * diff
+    mean = mean + increment
+    variance = (1 - alpha) * (variance + diff * increment)
+
+    return mean, variance, count + 1, z_score
+
+
+def is_anomalous(metric, z_score, threshold=ANOMALY_Z_THRESHOLD):
+    if z_score is None:
+        return False
+    return z_score * MONITORED_METRICS[metric] >= threshold
+
+
+def evaluate_series(metric, values, alpha=ANOMALY_EWMA_ALPHA, threshold=ANOMALY_Z_THRESHOLD):
+    """
+    Batch evaluation of one vendor's metric series (oldest first), used for backfills.
+    Returns the final (mean, variance, count) baseline and a list of
+    (index, expected, z_score) tuples for the flagged points.
+    """
+    mean, variance, count = 0.0, 0.0, 0
+    flagged = []
+    for index, value in enumerate(values):
+        expected = mean
+        mean, variance, count, z_score = ewma_update(mean, variance, count, value, alpha, threshold)
+        if is_anomalous(metric, z_score, threshold):
+            flagged.append((index, expected, z_score))
+    return (mean, variance, count), flagged
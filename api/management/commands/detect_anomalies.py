@@ -0,0 +1,68 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.anomalies import MONITORED_METRICS, evaluate_series
+from api.models import HistoricalPerformance, PerformanceAnomaly, PerformanceBaseline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild performance baselines and anomalies by replaying the HistoricalPerformance time series.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', help='Only backfill the vendor with this vendor_code.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Hold off incremental folds until the replay is committed, they then apply on top of it.
+            # On other databases the delete below takes the (database-wide) write lock first.
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'LOCK TABLE {connection.ops.quote_name(PerformanceBaseline._meta.db_table)} IN EXCLUSIVE MODE'
+                    )
+
+            stale_baselines = PerformanceBaseline.objects.all()
+            stale_anomalies = PerformanceAnomaly.objects.all()
+            history = HistoricalPerformance.objects.filter(date__isnull=False).order_by('vendor_id', 'date', 'id')
+            if options['vendor']:
+                stale_baselines = stale_baselines.filter(vendor_id=options['vendor'])
+                stale_anomalies = stale_anomalies.filter(vendor_id=options['vendor'])
+                history = history.filter(vendor_id=options['vendor'])
+            stale_baselines.delete()
+            stale_anomalies.delete()
+
+            rows = history.values_list('vendor_id', 'date', *MONITORED_METRICS).iterator(
+                chunk_size=options['batch_size']
+            )
+            baselines = []
+            anomalies = []
+            for vendor_id, vendor_rows in groupby(rows, key=lambda row: row[0]):
+                vendor_rows = list(vendor_rows)
+                dates = [row[1] for row in vendor_rows]
+                for column, metric in enumerate(MONITORED_METRICS, start=2):
+                    values = [row[column] for row in vendor_rows]
+                    (mean, variance, count), flagged = evaluate_series(metric, values)
+                    baselines.append(PerformanceBaseline(
+                        vendor_id=vendor_id, metric=metric, mean=mean, variance=variance, count=count
+                    ))
+                    anomalies.extend(
+                        PerformanceAnomaly(
+                            vendor_id=vendor_id,
+                            metric=metric,
+                            date=dates[index],
+                            value=values[index],
+                            expected=expected,
+                            z_score=z_score,
+                        )
+                        for index, expected, z_score in flagged
+                    )
+
+            PerformanceBaseline.objects.bulk_create(baselines, batch_size=options['batch_size'])
+            PerformanceAnomaly.objects.bulk_create(anomalies, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(baselines)} baselines and flagged {len(anomalies)} anomalies.'
+        ))
@@ -0,0 +1,200 @@
+import hashlib
+import re
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from api.models import Organization, PurchaseOrder
+
+STRATEGIES = {
+    # --by: (partition key column, PostgreSQL partition method, pg_partitioned_table.partstrat)
+    'organization': ('organization_id', 'LIST', 'l'),
+    'month': ('order_date', 'RANGE', 'r'),
+}
+
+
+def literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert api_purchaseorder into a PostgreSQL partitioned table (by organization or by month of '
+        'order_date), or add the partitions that are missing on an already partitioned table. '
+        'Rows without a matching partition (or without an organization) are kept in a DEFAULT partition '
+        'and moved out when their partition is created, so the command can be re-run after adding '
+        'organizations or every month. The partitioned table has no primary key constraint; po_number '
+        'stays unique through the api_purchaseorder_po_number table, maintained by a trigger.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by', choices=list(STRATEGIES), required=True)
+        parser.add_argument('--months-ahead', type=int, default=3, help='Monthly partitions to create ahead of today.')
+        parser.add_argument('--dry-run', action='store_true', help='Print the SQL instead of running it.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Table partitioning is only supported on PostgreSQL.')
+
+        self.table = PurchaseOrder._meta.db_table
+        self.column, self.method, partstrat = STRATEGIES[options['by']]
+        self.by = options['by']
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT partstrat FROM pg_partitioned_table WHERE partrelid = %s::regclass', [self.table]
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            statements = self.convert_statements(options['months_ahead'])
+        elif row[0] != partstrat:
+            raise CommandError(f'{self.table} is already partitioned with a different strategy.')
+        else:
+            statements = self.missing_partition_statements(options['months_ahead'])
+
+        if options['dry_run']:
+            for statement in statements:
+                self.stdout.write(statement + ';')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {len(statements)} partitioning statements on {self.table}.'))
+
+    def quote(self, name):
+        return connection.ops.quote_name(name)
+
+    def bounds(self, months_ahead):
+        """(partition name, FOR VALUES clause, WHERE condition) of every partition the table should have."""
+        if self.by == 'organization':
+            for code in Organization.objects.order_by('pk').values_list('pk', flat=True):
+                slug = re.sub(r'\W', '_', code.lower())[:30]
+                digest = hashlib.md5(code.encode()).hexdigest()[:8]
+                yield (
+                    f'{self.table}_org_{slug}_{digest}',
+                    f'FOR VALUES IN ({literal(code)})',
+                    f'{self.quote(self.column)} = {literal(code)}',
+                )
+            return
+
+        today = timezone.localdate().replace(day=1)
+        first_order = PurchaseOrder.objects.aggregate(first=Min('order_date'))['first']
+        month = timezone.localtime(first_order).date().replace(day=1) if first_order else today
+        last = add_months(today, months_ahead)
+        while month <= last:
+            start = timezone.make_aware(datetime(month.year, month.month, 1)).isoformat()
+            end_month = add_months(month, 1)
+            end = timezone.make_aware(datetime(end_month.year, end_month.month, 1)).isoformat()
+            yield (
+                f'{self.table}_{month:%Y_%m}',
+                f'FOR VALUES FROM ({literal(start)}) TO ({literal(end)})',
+                f'{self.quote(self.column)} >= {literal(start)} AND {self.quote(self.column)} < {literal(end)}',
+            )
+            month = end_month
+
+    def convert_statements(self, months_ahead):
+        table = self.quote(self.table)
+        staging = self.quote(f'{self.table}_partitioned')
+        numbers = self.quote(f'{self.table}_po_number')
+        sync_numbers = self.quote(f'{self.table}_po_number_sync')
+        po_number = PurchaseOrder._meta.pk
+
+        with connection.cursor() as cursor:
+            # Non-unique indexes and foreign keys are recreated on the partitioned table. The primary key
+            # is not: a partitioned table can only enforce uniqueness on columns including the partition
+            # key, so po_number uniqueness moves to a separate, unpartitioned table kept in sync by a trigger.
+            cursor.execute(
+                'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisunique',
+                [self.table],
+            )
+            indexes = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [self.table],
+            )
+            foreign_keys = cursor.fetchall()
+
+        statements = [
+            # Run pending deferred foreign key checks now, the old table can't be dropped while they're queued
+            'SET CONSTRAINTS ALL IMMEDIATE',
+            f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE',
+            f'CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY {self.method} ({self.quote(self.column)})',
+        ]
+        for name, values, condition in self.bounds(months_ahead):
+            statements.append(f'CREATE TABLE {self.quote(name)} PARTITION OF {staging} {values}')
+        statements += [
+            # Rows without a matching partition, including orders of vendors without an organization
+            f'CREATE TABLE {self.quote(self.table + "_default")} PARTITION OF {staging} DEFAULT',
+            f'INSERT INTO {staging} SELECT * FROM {table}',
+            f'CREATE TABLE {numbers} ({self.quote(po_number.column)} varchar({po_number.max_length}) PRIMARY KEY)',
+            f'INSERT INTO {numbers} SELECT {self.quote(po_number.column)} FROM {table}',
+            f'DROP TABLE {table}',
+            f'ALTER TABLE {staging} RENAME TO {table}',
+            f'CREATE INDEX {self.quote(self.table + "_po_number_idx")} ON {table} ({self.quote(po_number.column)})',
+        ]
+        statements += indexes
+        statements += [
+            f'ALTER TABLE {table} ADD CONSTRAINT {self.quote(name)} {definition}'
+            for name, definition in foreign_keys
+        ]
+        statements += [
+            f"""CREATE FUNCTION {sync_numbers}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.po_number = NEW.po_number THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        DELETE FROM {numbers} WHERE po_number = OLD.po_number;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {numbers} VALUES (NEW.po_number);
+    END IF;
+    RETURN NULL;
+END
+$$""",
+            # Moving a row to another partition runs as DELETE + INSERT, which keeps the numbers in step
+            f'CREATE TRIGGER {sync_numbers} AFTER INSERT OR DELETE OR UPDATE OF {self.quote(po_number.column)} '
+            f'ON {table} FOR EACH ROW EXECUTE FUNCTION {sync_numbers}()',
+        ]
+        return statements
+
+    def missing_partition_statements(self, months_ahead):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = %s::regclass',
+                [self.table],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+        table = self.quote(self.table)
+        default = self.quote(self.table + '_default')
+        numbers = self.quote(f'{self.table}_po_number')
+        po_number = self.quote(PurchaseOrder._meta.pk.column)
+        statements = []
+        for name, values, condition in self.bounds(months_ahead):
+            if name in existing:
+                continue
+            # Rows that landed in the DEFAULT partition have to move out before the new partition
+            # can be attached. Deleting them fires the po_number trigger of the default partition,
+            # while the new table has none yet, so their numbers are registered again.
+            statements += [
+                f'CREATE TABLE {self.quote(name)} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                f'INSERT INTO {self.quote(name)} SELECT * FROM {default} WHERE {condition}',
+                f'DELETE FROM {default} WHERE {condition}',
+                f'INSERT INTO {numbers} SELECT {po_number} FROM {self.quote(name)}',
+                f'ALTER TABLE {table} ATTACH PARTITION {self.quote(name)} {values}',
+            ]
+        return statements
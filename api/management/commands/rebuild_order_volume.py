@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.analytics import rebuild_order_volume
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the OrderVolumeCube from scratch from the PurchaseOrder table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', help='Only rebuild the cells of the vendor with this vendor_code.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cells = rebuild_order_volume(vendor=options['vendor'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} order volume cells.'))
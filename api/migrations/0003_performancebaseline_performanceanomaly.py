@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_historicalperformance_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('on_time_delivery_rate', 'On time delivery rate'), ('quality_rating_avg', 'Quality rating avg'), ('average_response_time', 'Average response time'), ('fulfillment_rate', 'Fulfillment rate')], max_length=50)),
+                ('date', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('expected', models.FloatField()),
+                ('z_score', models.FloatField()),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.vendor')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['vendor', 'date'], name='api_perform_vendor__14f6b5_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PerformanceBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('on_time_delivery_rate', 'On time delivery rate'), ('quality_rating_avg', 'Quality rating avg'), ('average_response_time', 'Average response time'), ('fulfillment_rate', 'Fulfillment rate')], max_length=50)),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.vendor')),
+            ],
+            options={
+                'unique_together': {('vendor', 'metric')},
+            },
+        ),
+    ]
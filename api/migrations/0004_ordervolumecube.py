@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_order_volume(apps, schema_editor):
+    PurchaseOrder = apps.get_model('api', 'PurchaseOrder')
+    OrderVolumeCube = apps.get_model('api', 'OrderVolumeCube')
+    rows = PurchaseOrder.objects.annotate(
+        period=TruncMonth('order_date', output_field=models.DateField())
+    ).values('vendor_id', 'period', 'status').annotate(
+        order_count=Count('po_number'),
+        total_quantity=Sum('quantity'),
+    ).order_by()
+    OrderVolumeCube.objects.bulk_create(
+        [
+            OrderVolumeCube(
+                vendor_id=row['vendor_id'],
+                period=row['period'],
+                status=row['status'],
+                order_count=row['order_count'],
+                total_quantity=row['total_quantity'] or 0,
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_performancebaseline_performanceanomaly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderVolumeCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('canceled', 'Canceled')], max_length=50)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_quantity', models.BigIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'status'], name='api_ordervo_period_079556_idx')],
+                'unique_together': {('vendor', 'period', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_order_volume, migrations.RunPython.noop),
+    ]
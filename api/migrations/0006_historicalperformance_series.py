@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_organization'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='historicalperformance',
+            options={'ordering': ['date']},
+        ),
+        migrations.AddIndex(
+            model_name='historicalperformance',
+            index=models.Index(fields=['vendor', 'date'], name='api_histori_vendor__74ed2d_idx'),
+        ),
+    ]
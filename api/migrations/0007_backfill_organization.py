@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_organization(apps, schema_editor):
+    Vendor = apps.get_model('api', 'Vendor')
+    PurchaseOrder = apps.get_model('api', 'PurchaseOrder')
+    HistoricalPerformance = apps.get_model('api', 'HistoricalPerformance')
+    vendor_organization = Subquery(Vendor.objects.filter(pk=OuterRef('vendor_id')).values('organization_id')[:1])
+    PurchaseOrder.objects.update(organization_id=vendor_organization)
+    HistoricalPerformance.objects.update(organization_id=vendor_organization)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_historicalperformance_series'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_organization, migrations.RunPython.noop),
+    ]
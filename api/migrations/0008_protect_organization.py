@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_backfill_organization'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalperformance',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='api.organization'),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='organization',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='api.organization'),
+        ),
+        migrations.AlterField(
+            model_name='vendor',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='api.organization'),
+        ),
+    ]
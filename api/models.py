@@ -1,13 +1,28 @@
 from django.utils import timezone
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Sum, Avg, F
 
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 
+from .anomalies import MONITORED_METRICS, ewma_update, is_anomalous
+
+class Organization(models.Model):
+    """
+    ● organization_code: CharField - A unique identifier for the organization (tenant).
+    ● name: CharField - Organization's name.
+    """
+    organization_code = models.CharField(max_length=50, primary_key=True)
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+
 class Vendor(models.Model):
     """
+    ● organization: ForeignKey - Link to the Organization the vendor belongs to (nullable, an organization with vendors can't be deleted).
     ● vendor_code: CharField - A unique identifier for the vendor.
     ● name: CharField - Vendor's name.
     ● contact_details: TextField - Contact information of the vendor.
@@ -18,6 +33,7 @@ class Vendor(models.Model):
     ● fulfillment_rate: FloatField - Percentage of purchase orders fulfilled successfully.
     """
     vendor_code = models.CharField(max_length=50, primary_key=True)
+    organization = models.ForeignKey(Organization, on_delete=models.PROTECT, null=True, blank=True)
     name = models.CharField(max_length=255)
     contact_details = models.TextField()
     address = models.TextField()
@@ -29,11 +45,24 @@ class Vendor(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored organization, so a change can be propagated when the vendor is saved
+        instance._stored_organization_id = instance.__dict__.get('organization_id')
+        return instance
+
+    def sync_organization(self):
+        # Purchase orders and history carry a copy of the vendor's organization; move them along with it.
+        PurchaseOrder.objects.filter(vendor=self).update(organization_id=self.organization_id)
+        HistoricalPerformance.objects.filter(vendor=self).update(organization_id=self.organization_id)
+
 
 class PurchaseOrder(models.Model):
     """
     ● po_number: CharField - Unique number identifying the PO.
     ● vendor: ForeignKey - Link to the Vendor model.
+    ● organization: ForeignKey - Organization of the vendor, copied on save so queries can be pruned to one tenant.
     ● order_date: DateTimeField - Date when the order was placed.
     ● delivery_date: DateTimeField - Expected or actual delivery date of the order.
     ● items: JSONField - Details of items ordered.
@@ -51,6 +80,7 @@ class PurchaseOrder(models.Model):
 
     po_number = models.CharField(max_length=100, primary_key=True)
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    organization = models.ForeignKey(Organization, on_delete=models.PROTECT, null=True, blank=True, editable=False)
     order_date = models.DateTimeField()
     delivery_date = models.DateTimeField()
     items = models.JSONField()
@@ -60,15 +90,32 @@ class PurchaseOrder(models.Model):
     issue_date = models.DateTimeField()
     acknowledgment_date = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'vendor', 'status']),
+            models.Index(fields=['organization', 'order_date']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the order and the aggregates its signals maintain in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+    def vendor_orders(self):
+        # Filtering on the organization as well lets PostgreSQL prune to the tenant's partition.
+        return PurchaseOrder.objects.filter(organization_id=self.organization_id, vendor_id=self.vendor_id)
+
     def calculate_on_time_delivery_rate(self):
-        completed_orders_count = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        completed_orders_count = self.vendor_orders().filter(
             status='completed',
             delivery_date__lte=F('acknowledgment_date')
         ).count()
 
-        total_completed_orders = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        total_completed_orders = self.vendor_orders().filter(
             status='completed'
         ).count()
 
@@ -80,8 +127,7 @@ class PurchaseOrder(models.Model):
         return on_time_delivery_rate
     
     def calculate_quality_rating_average(self):
-        completed_orders = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        completed_orders = self.vendor_orders().filter(
             status='completed',
             quality_rating__isnull=False
         )
@@ -96,8 +142,7 @@ class PurchaseOrder(models.Model):
         return quality_rating_average
 
     def calculate_average_response_time(self):
-        completed_orders = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        completed_orders = self.vendor_orders().filter(
             status='completed',
             acknowledgment_date__isnull=False
         )
@@ -119,15 +164,13 @@ class PurchaseOrder(models.Model):
         return average_response_time
 
     def calculate_fulfillment_rate(self):
-        successful_orders_count = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        successful_orders_count = self.vendor_orders().filter(
             status='completed',
             quality_rating__isnull=False,
             acknowledgment_date__isnull=False
         ).count()
 
-        total_orders = PurchaseOrder.objects.filter(
-            vendor=self.vendor,
+        total_orders = self.vendor_orders().filter(
             status='completed'
         ).count()
 
@@ -145,6 +188,7 @@ class PurchaseOrder(models.Model):
 class HistoricalPerformance(models.Model):
     """
     ● vendor: ForeignKey - Link to the Vendor model.
+    ● organization: ForeignKey - Organization of the vendor, copied so history can be scoped to one tenant (moves with the vendor).
     ● date: DateTimeField - Date of the performance record.
     ● on_time_delivery_rate: FloatField - Historical record of the on-time delivery rate.
     ● quality_rating_avg: FloatField - Historical record of the quality rating average.
@@ -152,40 +196,232 @@ class HistoricalPerformance(models.Model):
     ● fulfillment_rate: FloatField - Historical record of the fulfilment rate.
     """
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    organization = models.ForeignKey(Organization, on_delete=models.PROTECT, null=True, blank=True)
     date = models.DateTimeField()
     on_time_delivery_rate = models.FloatField()
     quality_rating_avg = models.FloatField()
     average_response_time = models.FloatField()
     fulfillment_rate = models.FloatField()
 
+    class Meta:
+        ordering = ['date']
+        indexes = [models.Index(fields=['vendor', 'date'])]
+
     def __str__(self):
         return f"{self.vendor} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        # Keep the record and its fold into the anomaly baselines in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+metric_choices = [(metric, metric.replace('_', ' ').capitalize()) for metric in MONITORED_METRICS]
+
+
+class PerformanceBaseline(models.Model):
+    """
+    ● vendor: ForeignKey - Link to the Vendor model.
+    ● metric: CharField - Name of the monitored performance metric.
+    ● mean: FloatField - Exponentially weighted moving average of the metric.
+    ● variance: FloatField - Exponentially weighted moving variance of the metric.
+    ● count: IntegerField - Number of snapshots folded into the baseline.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    metric = models.CharField(max_length=50, choices=metric_choices)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['vendor', 'metric']
+
+    def __str__(self):
+        return f"{self.vendor} - {self.metric}"
+
+
+class PerformanceAnomaly(models.Model):
+    """
+    ● vendor: ForeignKey - Link to the Vendor model.
+    ● metric: CharField - Name of the performance metric that degraded.
+    ● date: DateTimeField - Date of the performance record that was flagged.
+    ● value: FloatField - Observed value of the metric.
+    ● expected: FloatField - Baseline (EWMA) value of the metric before the observation.
+    ● z_score: FloatField - Deviation of the observation from the baseline, in standard deviations.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    metric = models.CharField(max_length=50, choices=metric_choices)
+    date = models.DateTimeField()
+    value = models.FloatField()
+    expected = models.FloatField()
+    z_score = models.FloatField()
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [models.Index(fields=['vendor', 'date'])]
+
+    def __str__(self):
+        return f"{self.vendor} - {self.metric} - {self.date}"
+
+
+def order_period(order_date):
+    """Month bucket (first day of the month, in the current timezone) of a PO's order_date."""
+    # order_date may still be the raw value assigned to the model (e.g. an ISO string)
+    order_date = PurchaseOrder._meta.get_field('order_date').to_python(order_date)
+    if timezone.is_aware(order_date):
+        order_date = timezone.localtime(order_date)
+    return order_date.date().replace(day=1)
+
+
+class OrderVolumeCube(models.Model):
+    """
+    ● vendor: ForeignKey - Link to the Vendor model.
+    ● period: DateField - First day of the month the orders were placed in.
+    ● status: CharField - Status of the purchase orders in the cell.
+    ● order_count: IntegerField - Number of purchase orders in the cell.
+    ● total_quantity: BigIntegerField - Total quantity of items ordered in the cell.
+    """
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    period = models.DateField()
+    status = models.CharField(max_length=50, choices=PurchaseOrder.status_choices)
+    order_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['vendor', 'period', 'status']
+        indexes = [models.Index(fields=['period', 'status'])]
+
+    def __str__(self):
+        return f"{self.vendor} - {self.period} - {self.status}"
+
+    @classmethod
+    def apply(cls, vendor_id, order_date, status, order_count, quantity):
+        """
+        Add order_count orders totalling quantity items to the cube cell of a PO.
+        Cells are never deleted when they drop to zero (only rebuilds remove
+        them), so a concurrent increment can't land on a cell that just vanished.
+        """
+        cell = {'vendor_id': vendor_id, 'period': order_period(order_date), 'status': status}
+        if order_count > 0:
+            cls.objects.get_or_create(**cell)
+        cls.objects.filter(**cell).update(
+            order_count=F('order_count') + order_count,
+            total_quantity=F('total_quantity') + quantity,
+        )
+
+
+@receiver(post_save, sender=Vendor)
+def update_vendor_organization(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and not {'organization', 'organization_id'} & set(update_fields):
+        return
+    # Vendors not loaded from the database have no stored organization to compare with, so always sync those
+    if not created and getattr(instance, '_stored_organization_id', Vendor) != instance.organization_id:
+        instance.sync_organization()
+    instance._stored_organization_id = instance.organization_id
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+def assign_organization(sender, instance, **kwargs):
+    instance.organization_id = instance.vendor.organization_id
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+def capture_order_volume(sender, instance, **kwargs):
+    # Lock the stored row so concurrent updates of the same order apply their deltas one after the other
+    instance._previous_cube_cell = PurchaseOrder.objects.select_for_update().filter(pk=instance.pk).values_list(
+        'vendor_id', 'order_date', 'status', 'quantity'
+    ).first()
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def update_order_volume(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_cube_cell', None)
+    order_date = PurchaseOrder._meta.get_field('order_date').to_python(instance.order_date)
+    current = (instance.vendor_id, order_date, instance.status, instance.quantity)
+    if previous is not None:
+        if previous == current:
+            return
+        vendor_id, order_date, status, quantity = previous
+        OrderVolumeCube.apply(vendor_id, order_date, status, -1, -quantity)
+    vendor_id, order_date, status, quantity = current
+    OrderVolumeCube.apply(vendor_id, order_date, status, 1, quantity)
+
+
+@receiver(pre_delete, sender=PurchaseOrder)
+def capture_deleted_order_volume(sender, instance, **kwargs):
+    # The stored row is what was counted, not the (possibly modified) instance
+    instance._previous_cube_cell = PurchaseOrder.objects.select_for_update().filter(pk=instance.pk).values_list(
+        'vendor_id', 'order_date', 'status', 'quantity'
+    ).first()
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def remove_order_volume(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_cube_cell', None)
+    if previous is not None:
+        vendor_id, order_date, status, quantity = previous
+        OrderVolumeCube.apply(vendor_id, order_date, status, -1, -quantity)
+
 
 @receiver(post_save, sender=PurchaseOrder)
 def update_performance_metrics(sender, instance, **kwargs):
-    vendor = instance.vendor
-    vendor.on_time_delivery_rate = instance.calculate_on_time_delivery_rate()
-    vendor.quality_rating_avg = instance.calculate_quality_rating_average()
-    vendor.average_response_time = instance.calculate_average_response_time()
-    vendor.fulfillment_rate = instance.calculate_fulfillment_rate()
-    vendor.save()
-
-    # Update HistoricalPerformance metrics
-    historical_performance, created = HistoricalPerformance.objects.get_or_create(
+    # Compare against the stored metrics (instance.vendor may be stale), locked so recomputes for a vendor don't interleave
+    vendor = Vendor.objects.select_for_update().get(pk=instance.vendor_id)
+    metrics = {
+        'on_time_delivery_rate': instance.calculate_on_time_delivery_rate(),
+        'quality_rating_avg': instance.calculate_quality_rating_average(),
+        'average_response_time': instance.calculate_average_response_time(),
+        'fulfillment_rate': instance.calculate_fulfillment_rate(),
+    }
+    changed = any(getattr(vendor, metric) != value for metric, value in metrics.items())
+    if not changed and HistoricalPerformance.objects.filter(vendor=vendor).exists():
+        return
+
+    for metric, value in metrics.items():
+        setattr(vendor, metric, value)
+    vendor.save(update_fields=list(metrics))
+
+    # Append a HistoricalPerformance snapshot per change, so the history is a time series per vendor
+    HistoricalPerformance.objects.create(
         vendor=vendor,
-        defaults={
-            'date': timezone.now(),
-            'on_time_delivery_rate': vendor.on_time_delivery_rate,
-            'quality_rating_avg': vendor.quality_rating_avg,
-            'average_response_time': vendor.average_response_time,
-            'fulfillment_rate': vendor.fulfillment_rate,
-        }
+        organization_id=vendor.organization_id,
+        date=timezone.now(),
+        **metrics
     )
-    if not created:
-        historical_performance.date = timezone.now()
-        historical_performance.on_time_delivery_rate = vendor.on_time_delivery_rate
-        historical_performance.quality_rating_avg = vendor.quality_rating_avg
-        historical_performance.average_response_time = vendor.average_response_time
-        historical_performance.fulfillment_rate = vendor.fulfillment_rate
-    historical_performance.save()
+
+
+@receiver(post_save, sender=HistoricalPerformance)
+def detect_performance_anomalies(sender, instance, created, **kwargs):
+    # Undated (legacy) records have no place in the time series; the backfill skips them too
+    if not created or instance.date is None:
+        return
+
+    with transaction.atomic():
+        # Lock the vendor's baselines so concurrent snapshots are folded in one after the other
+        baselines = list(PerformanceBaseline.objects.select_for_update().filter(vendor_id=instance.vendor_id))
+        if len(baselines) < len(MONITORED_METRICS):
+            PerformanceBaseline.objects.bulk_create(
+                [PerformanceBaseline(vendor_id=instance.vendor_id, metric=metric) for metric in MONITORED_METRICS],
+                ignore_conflicts=True,
+            )
+            baselines = list(PerformanceBaseline.objects.select_for_update().filter(vendor_id=instance.vendor_id))
+
+        anomalies = []
+        for baseline in baselines:
+            value = getattr(instance, baseline.metric)
+            expected = baseline.mean
+            baseline.mean, baseline.variance, baseline.count, z_score = ewma_update(
+                baseline.mean, baseline.variance, baseline.count, value
+            )
+            if is_anomalous(baseline.metric, z_score):
+                anomalies.append(PerformanceAnomaly(
+                    vendor_id=instance.vendor_id,
+                    metric=baseline.metric,
+                    date=instance.date,
+                    value=value,
+                    expected=expected,
+                    z_score=z_score,
+                ))
+
+        PerformanceBaseline.objects.bulk_update(baselines, ['mean', 'variance', 'count'])
+        PerformanceAnomaly.objects.bulk_create(anomalies)
@@ -1,10 +1,16 @@
 from rest_framework import serializers
 from .models import *
 
+class OrganizationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Organization
+        fields = ['organization_code', 'name']
+
+
 class VendorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vendor
-        fields = ['vendor_code', 'name', 'contact_details', 'address', 'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
+        fields = ['vendor_code', 'organization', 'name', 'contact_details', 'address', 'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
         read_only_fields = ['on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
 
     def create(self, validated_data):
@@ -20,21 +26,21 @@ class VendorSerializer(serializers.ModelSerializer):
 class VendorDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vendor
-        fields = ['vendor_code', 'name', 'contact_details', 'address', 'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
+        fields = ['vendor_code', 'organization', 'name', 'contact_details', 'address', 'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
         read_only_fields = ['vendor_code', 'on_time_delivery_rate', 'quality_rating_avg', 'average_response_time', 'fulfillment_rate']
 
 
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrder
-        fields = ['po_number', 'vendor', 'order_date', 'delivery_date', 'items', 'quantity', 'status', 'quality_rating', 'issue_date', 'acknowledgment_date']
+        fields = ['po_number', 'vendor', 'organization', 'order_date', 'delivery_date', 'items', 'quantity', 'status', 'quality_rating', 'issue_date', 'acknowledgment_date']
         read_only_fields = ['status', 'quality_rating', 'acknowledgment_date']
 
 
 class PurchaseOrderDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrder
-        fields = ['po_number', 'vendor', 'order_date', 'delivery_date', 'items', 'quantity', 'status', 'quality_rating', 'issue_date', 'acknowledgment_date']
+        fields = ['po_number', 'vendor', 'organization', 'order_date', 'delivery_date', 'items', 'quantity', 'status', 'quality_rating', 'issue_date', 'acknowledgment_date']
         read_only_fields = ['po_number']
 
 
@@ -48,3 +54,18 @@ class AcknowledgePurchaseOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = PurchaseOrder
         fields = ['acknowledgment_date']
+
+
+class PerformanceAnomalySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PerformanceAnomaly
+        fields = ['id', 'vendor', 'metric', 'date', 'value', 'expected', 'z_score']
+
+
+class OrderVolumeQuerySerializer(serializers.Serializer):
+    group_by = serializers.MultipleChoiceField(choices=['vendor', 'period', 'status'], required=False)
+    granularity = serializers.ChoiceField(choices=['month', 'quarter', 'year'], default='month')
+    vendor_id = serializers.ListField(child=serializers.CharField(), required=False)
+    status = serializers.ListField(child=serializers.ChoiceField(choices=PurchaseOrder.status_choices), required=False)
+    period_start = serializers.DateField(required=False)
+    period_end = serializers.DateField(required=False)
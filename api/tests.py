@@ -1,3 +1,331 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+
+from .analytics import query_order_volume, rebuild_order_volume
+from .anomalies import evaluate_series
+from .models import *
+
+
+def create_vendor(vendor_code='V1', **kwargs):
+    return Vendor.objects.create(
+        vendor_code=vendor_code,
+        name=vendor_code,
+        contact_details='contact',
+        address='address',
+        on_time_delivery_rate=0,
+        quality_rating_avg=0,
+        average_response_time=0,
+        fulfillment_rate=0,
+        **kwargs
+    )
+
+
+def create_purchase_order(po_number, vendor, order_date=datetime(2024, 1, 5, tzinfo=dt_timezone.utc), **kwargs):
+    return PurchaseOrder.objects.create(
+        po_number=po_number,
+        vendor=vendor,
+        order_date=order_date,
+        delivery_date=order_date,
+        items={},
+        quantity=kwargs.pop('quantity', 1),
+        issue_date=order_date,
+        **kwargs
+    )
+
+
+class AnomalyScorerTests(SimpleTestCase):
+    def test_drop_after_flat_series_is_flagged(self):
+        baseline, flagged = evaluate_series('on_time_delivery_rate', [90] * 10 + [10, 10])
+        self.assertEqual([index for index, expected, z_score in flagged], [10, 11])
+
+    def test_small_change_after_flat_series_is_not_flagged(self):
+        baseline, flagged = evaluate_series('on_time_delivery_rate', [90, 91] * 3 + [90] * 15 + [88])
+        self.assertEqual(flagged, [])
+
+    def test_only_degradations_are_flagged(self):
+        baseline, flagged = evaluate_series('average_response_time', [10] * 10 + [1, 60])
+        self.assertEqual([index for index, expected, z_score in flagged], [11])
+
+
+class PerformanceAnomalyTests(TestCase):
+    def setUp(self):
+        self.vendor = create_vendor()
+
+    def snapshot(self, days, on_time_delivery_rate):
+        return HistoricalPerformance.objects.create(
+            vendor=self.vendor,
+            date=datetime(2024, 1, 1, tzinfo=dt_timezone.utc) + timedelta(days=days),
+            on_time_delivery_rate=on_time_delivery_rate,
+            quality_rating_avg=4,
+            average_response_time=10,
+            fulfillment_rate=95,
+        )
+
+    def test_snapshot_is_folded_once(self):
+        create_purchase_order('P1', self.vendor)
+        self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+        self.assertEqual(set(PerformanceBaseline.objects.values_list('count', flat=True)), {1})
+
+    def test_unchanged_metrics_do_not_add_snapshots(self):
+        create_purchase_order('P1', self.vendor)
+        create_purchase_order('P2', self.vendor)
+        self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 1)
+
+    def test_changed_metrics_append_snapshots(self):
+        purchase_order = create_purchase_order('P1', self.vendor)
+        purchase_order.status = 'completed'
+        purchase_order.quality_rating = 5
+        purchase_order.save()
+        self.assertEqual(HistoricalPerformance.objects.filter(vendor=self.vendor).count(), 2)
+
+    def test_stale_vendor_instance_does_not_skip_metrics(self):
+        purchase_order = create_purchase_order('P1', self.vendor)
+        stale = PurchaseOrder.objects.select_related('vendor').get(pk='P1')
+
+        purchase_order.status = 'completed'
+        purchase_order.quality_rating = 5
+        purchase_order.acknowledgment_date = purchase_order.issue_date
+        purchase_order.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual((self.vendor.quality_rating_avg, self.vendor.fulfillment_rate), (5.0, 100.0))
+
+        # stale still holds the vendor as it was before the order was completed
+        stale.save()
+        self.vendor.refresh_from_db()
+        self.assertEqual((self.vendor.quality_rating_avg, self.vendor.fulfillment_rate), (0.0, 0.0))
+
+    def test_undated_records_are_not_scored(self):
+        HistoricalPerformance.objects.create(
+            vendor=self.vendor, date=None, on_time_delivery_rate=90,
+            quality_rating_avg=4, average_response_time=10, fulfillment_rate=95,
+        )
+        self.assertFalse(PerformanceBaseline.objects.exists())
+        call_command('detect_anomalies', stdout=StringIO())
+        self.assertFalse(PerformanceBaseline.objects.exists())
+
+    def test_drop_is_stored_and_exposed(self):
+        for days in range(10):
+            self.snapshot(days, 90)
+        self.snapshot(10, 10)
+
+        anomaly = PerformanceAnomaly.objects.get()
+        self.assertEqual(anomaly.metric, 'on_time_delivery_rate')
+        self.assertEqual(anomaly.value, 10)
+        response = self.client.get('/api/vendors/V1/anomalies/')
+        self.assertEqual([row['metric'] for row in response.json()], ['on_time_delivery_rate'])
+
+    def test_backfill_matches_incremental_state(self):
+        for days, value in enumerate([90, 91] * 5 + [10, 10, 90]):
+            self.snapshot(days, value)
+        baselines = list(PerformanceBaseline.objects.order_by('metric').values_list('metric', 'mean', 'variance', 'count'))
+        anomalies = list(PerformanceAnomaly.objects.order_by('date').values_list('metric', 'date', 'z_score'))
+
+        call_command('detect_anomalies', stdout=StringIO())
+
+        self.assertEqual(
+            list(PerformanceBaseline.objects.order_by('metric').values_list('metric', 'mean', 'variance', 'count')),
+            baselines,
+        )
+        self.assertEqual(
+            list(PerformanceAnomaly.objects.order_by('date').values_list('metric', 'date', 'z_score')),
+            anomalies,
+        )
+        self.assertEqual(len(anomalies), 2)
+
+
+class OrderVolumeCubeTests(TestCase):
+    def setUp(self):
+        self.vendor = create_vendor('V1')
+        self.other_vendor = create_vendor('V2')
+
+    def cube(self):
+        return query_order_volume(group_by=['vendor', 'period', 'status'])
+
+    def test_cube_matches_rebuild_after_updates_and_deletes(self):
+        first = create_purchase_order('P1', self.vendor, quantity=5)
+        second = create_purchase_order('P2', self.vendor, quantity=7)
+        third = create_purchase_order('P3', self.other_vendor, datetime(2024, 3, 10, tzinfo=dt_timezone.utc), quantity=2)
+
+        first.status = 'completed'
+        first.quantity = 6
+        first.save()
+        second.vendor = self.other_vendor
+        second.order_date = datetime(2024, 2, 1, tzinfo=dt_timezone.utc)
+        second.save()
+        third.delete()
+        create_purchase_order('P4', self.vendor, quantity=1).save()
+
+        incremental = self.cube()
+        self.assertEqual(incremental, [
+            {'vendor': 'V1', 'period': date(2024, 1, 1), 'status': 'completed', 'order_count': 1, 'total_quantity': 6},
+            {'vendor': 'V1', 'period': date(2024, 1, 1), 'status': 'pending', 'order_count': 1, 'total_quantity': 1},
+            {'vendor': 'V2', 'period': date(2024, 2, 1), 'status': 'pending', 'order_count': 1, 'total_quantity': 7},
+        ])
+        rebuild_order_volume()
+        self.assertEqual(self.cube(), incremental)
+
+    def test_delete_removes_the_stored_order(self):
+        purchase_order = create_purchase_order('P1', self.vendor, quantity=5)
+        purchase_order.quantity = 9
+        purchase_order.status = 'completed'
+        purchase_order.delete()
+        self.assertEqual(self.cube(), [])
+
+    def test_raw_order_date_is_bucketed(self):
+        create_purchase_order('P1', self.vendor, order_date='2024-01-05T00:00:00Z', quantity=3)
+        self.assertEqual(self.cube(), [
+            {'vendor': 'V1', 'period': date(2024, 1, 1), 'status': 'pending', 'order_count': 1, 'total_quantity': 3},
+        ])
+
+    def test_period_bounds_are_month_inclusive(self):
+        create_purchase_order('P1', self.vendor, datetime(2024, 3, 20, tzinfo=dt_timezone.utc), quantity=3)
+        create_purchase_order('P2', self.vendor, datetime(2024, 4, 20, tzinfo=dt_timezone.utc), quantity=4)
+        response = self.client.get('/api/analytics/order_volume/?period_start=2024-03-15&period_end=2024-03-15')
+        self.assertEqual(response.json(), [{'order_count': 1, 'total_quantity': 3}])
+
+    def test_rollup_endpoint(self):
+        create_purchase_order('P1', self.vendor, datetime(2024, 1, 20, tzinfo=dt_timezone.utc), quantity=3)
+        create_purchase_order('P2', self.other_vendor, datetime(2024, 3, 20, tzinfo=dt_timezone.utc), quantity=4)
+        create_purchase_order('P3', self.vendor, datetime(2024, 4, 20, tzinfo=dt_timezone.utc), quantity=5)
+
+        response = self.client.get('/api/analytics/order_volume/?group_by=period&granularity=quarter')
+        self.assertEqual(response.json(), [
+            {'period': '2024-01-01', 'order_count': 2, 'total_quantity': 7},
+            {'period': '2024-04-01', 'order_count': 1, 'total_quantity': 5},
+        ])
+        response = self.client.get('/api/analytics/order_volume/?group_by=vendor&status=pending')
+        self.assertEqual(response.json(), [
+            {'vendor': 'V1', 'order_count': 2, 'total_quantity': 8},
+            {'vendor': 'V2', 'order_count': 1, 'total_quantity': 4},
+        ])
+        self.assertEqual(self.client.get('/api/analytics/order_volume/?group_by=quantity').status_code, 400)
+
+
+class OrganizationScopingTests(TestCase):
+    def setUp(self):
+        Organization.objects.create(organization_code='A', name='A')
+        Organization.objects.create(organization_code='B', name='B')
+        self.vendor = create_vendor('V1', organization_id='A')
+        self.other_vendor = create_vendor('V2', organization_id='B')
+        create_purchase_order('P1', self.vendor)
+        create_purchase_order('P2', self.other_vendor)
+
+    def test_purchase_orders_are_scoped(self):
+        response = self.client.get('/api/purchase_orders/', HTTP_X_ORGANIZATION='A')
+        self.assertEqual([row['po_number'] for row in response.json()], ['P1'])
+        self.assertEqual(self.client.get('/api/purchase_orders/P2/', HTTP_X_ORGANIZATION='A').status_code, 404)
+        self.assertEqual(len(self.client.get('/api/purchase_orders/').json()), 2)
+
+    def test_purchase_order_for_other_tenants_vendor_is_rejected(self):
+        response = self.client.post('/api/purchase_orders/', {
+            'po_number': 'P3',
+            'vendor': 'V2',
+            'order_date': '2024-01-05T00:00:00Z',
+            'delivery_date': '2024-01-05T00:00:00Z',
+            'items': {},
+            'quantity': 1,
+            'issue_date': '2024-01-05T00:00:00Z',
+        }, content_type='application/json', HTTP_X_ORGANIZATION='A')
+        self.assertEqual(response.status_code, 400)
+
+    def test_scoped_vendor_cannot_move_to_other_tenant(self):
+        response = self.client.put('/api/vendors/V1/', {
+            'name': 'V1', 'contact_details': 'contact', 'address': 'address', 'organization': 'B',
+        }, content_type='application/json', HTTP_X_ORGANIZATION='A')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PurchaseOrder.objects.get(pk='P1').organization_id, 'A')
+
+    def test_vendor_creation(self):
+        vendor = {'vendor_code': 'V3', 'name': 'V3', 'contact_details': 'contact', 'address': 'address'}
+        response = self.client.post('/api/vendors/', vendor, content_type='application/json', HTTP_X_ORGANIZATION='A')
+        self.assertEqual(response.json()['organization'], 'A')
+        response = self.client.post('/api/vendors/', {**vendor, 'vendor_code': 'V4', 'organization': 'B'},
+                                    content_type='application/json', HTTP_X_ORGANIZATION='A')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/vendors/', {**vendor, 'vendor_code': 'V4', 'organization': 'B'},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['organization'], 'B')
+
+    def test_unknown_organization_is_rejected(self):
+        vendor = {'vendor_code': 'V3', 'name': 'V3', 'contact_details': 'contact', 'address': 'address'}
+        response = self.client.post('/api/vendors/', vendor, content_type='application/json', HTTP_X_ORGANIZATION='NOPE')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Vendor.objects.filter(pk='V3').exists())
+        self.assertEqual(self.client.get('/api/purchase_orders/', HTTP_X_ORGANIZATION='NOPE').status_code, 404)
+
+    def test_organization_with_vendors_cannot_be_deleted(self):
+        with self.assertRaises(models.ProtectedError):
+            Organization.objects.get(pk='A').delete()
+        self.assertEqual(Vendor.objects.filter(organization_id='A').count(), 1)
+        self.assertEqual(PurchaseOrder.objects.filter(organization_id='A').count(), 1)
+
+    def test_unscoped_vendor_move_carries_orders(self):
+        response = self.client.put('/api/vendors/V1/', {
+            'name': 'V1', 'contact_details': 'contact', 'address': 'address', 'organization': 'B',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PurchaseOrder.objects.get(pk='P1').organization_id, 'B')
+
+    def test_organization_assigned_through_orm_keeps_metrics(self):
+        vendor = create_vendor('V5')
+        acknowledged = datetime(2024, 1, 6, tzinfo=dt_timezone.utc)
+        for po_number in ['P5', 'P6', 'P7']:
+            create_purchase_order(po_number, vendor, status='completed', quality_rating=5, acknowledgment_date=acknowledged)
+
+        vendor = Vendor.objects.get(pk='V5')
+        vendor.organization_id = 'A'
+        vendor.save()
+        create_purchase_order('P8', vendor, status='completed', quality_rating=1)
+
+        vendor.refresh_from_db()
+        self.assertEqual(vendor.quality_rating_avg, 4.0)
+        self.assertEqual(vendor.fulfillment_rate, 75.0)
+        self.assertEqual(set(PurchaseOrder.objects.filter(vendor=vendor).values_list('organization_id', flat=True)), {'A'})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Table partitioning is only supported on PostgreSQL.')
+class PartitionPurchaseOrdersTests(TestCase):
+    def setUp(self):
+        Organization.objects.create(organization_code='A', name='A')
+        self.vendor = create_vendor('V1', organization_id='A')
+        self.unassigned_vendor = create_vendor('V2')
+        create_purchase_order('P1', self.vendor)
+        create_purchase_order('P2', self.unassigned_vendor)
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text, po_number FROM api_purchaseorder ORDER BY po_number')
+            return dict((po_number, partition) for partition, po_number in cursor.fetchall())
+
+    def test_partition_by_organization(self):
+        call_command('partition_purchase_orders', by='organization', stdout=StringIO())
+        partitions = self.partitions()
+        self.assertTrue(partitions['P1'].startswith('api_purchaseorder_org_a_'))
+        self.assertEqual(partitions['P2'], 'api_purchaseorder_default')
+
+        # Orders of vendors without an organization still work, and po_number stays unique
+        create_purchase_order('P3', self.unassigned_vendor)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_purchase_order('P1', self.unassigned_vendor)
+
+        # A new organization gets its partition on the next run, and its orders move out of the default one
+        Organization.objects.create(organization_code='B', name='B')
+        self.unassigned_vendor.organization_id = 'B'
+        self.unassigned_vendor.save()
+        call_command('partition_purchase_orders', by='organization', stdout=StringIO())
+        partitions = self.partitions()
+        self.assertTrue(partitions['P2'].startswith('api_purchaseorder_org_b_'))
+        self.assertTrue(partitions['P3'].startswith('api_purchaseorder_org_b_'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_purchase_order('P2', self.vendor)
+
+    def test_partition_by_month_keeps_po_number_unique(self):
+        call_command('partition_purchase_orders', by='month', stdout=StringIO())
+        self.assertEqual(self.partitions()['P1'], 'api_purchaseorder_2024_01')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_purchase_order('P1', self.vendor, datetime(2024, 2, 5, tzinfo=dt_timezone.utc))
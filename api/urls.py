@@ -3,6 +3,12 @@ from django.urls import path
 from .views import *
 
 '''
+● POST /organizations/: Create a new organization.
+● GET /organizations/: List all organizations.
+
+Every endpoint below is scoped to one organization when the X-Organization header
+(or the organization query parameter) is given.
+
 ● POST /vendors/: Create a new vendor.
 ● GET /vendors/: List all vendors.
 ● GET /vendors/{vendor_id}/: Retrieve a specific vendor's details.
@@ -16,12 +22,19 @@ from .views import *
 ● DELETE /purchase_orders/{po_id}/: Delete a purchase order.
 
 ● GET /vendors/{vendor_id}/performance/: Retrieve a vendor's performance metrics.
+● GET /vendors/{vendor_id}/anomalies/: Retrieve a vendor's flagged performance anomalies.
+● GET /anomalies/: List all flagged performance anomalies with an option to filter by vendor and metric.
+
+● GET /analytics/order_volume/: Order count and quantity sliced and rolled up by vendor, period and status.
 
 ● PUT /purchase_orders/{po_number}/acknowledge/: For vendors to acknowledge POs.
 '''
 
 urlpatterns = [
+    path('organizations/', Organizations, name='organization_list'),  # get all and post new
+
     path('vendors/<str:vendor_code>/performance/', VendorPerformance, name='vendor_performance'),  # get
+    path('vendors/<str:vendor_code>/anomalies/', PerformanceAnomalies, name='vendor_anomalies'),  # get
 
     path('vendors/<str:vendor_code>/', VendorID, name='vendor_detail'),  # get, put, and delete
     path('vendors/', Vendors, name='vendor_list'),  # get all and post new
@@ -30,4 +43,8 @@ urlpatterns = [
 
     path('purchase_orders/<str:po_number>/', PurchaseOrderID, name='purchase_order_detail'),  # get, put, and delete
     path('purchase_orders/', PurchaseOrders, name='purchase_order_list'),  # get all and post new
+
+    path('anomalies/', PerformanceAnomalies, name='anomaly_list'),  # get all
+
+    path('analytics/order_volume/', OrderVolume, name='order_volume'),  # get
 ]
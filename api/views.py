@@ -1,12 +1,77 @@
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 
 from .models import *
 from .serializers import *
+from .analytics import query_order_volume
+
+
+class OrganizationScopedMixin:
+    """
+    Scopes the queryset to the organization passed in the X-Organization header
+    (or the organization query parameter), so tenant queries only touch that
+    tenant's rows (and partition, when purchase orders are partitioned).
+    """
+    organization_field = 'organization_id'
+
+    def get_organization(self):
+        """The scoped Organization, or None for unscoped requests."""
+        if not hasattr(self, '_organization'):
+            organization_code = self.request.headers.get('X-Organization') or self.request.query_params.get('organization')
+            self._organization = None
+            if organization_code:
+                self._organization = Organization.objects.filter(pk=organization_code).first()
+                if self._organization is None:
+                    raise NotFound(f"Organization '{organization_code}' does not exist.")
+        return self._organization
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        organization = self.get_organization()
+        if organization:
+            queryset = queryset.filter(**{self.organization_field: organization.pk})
+        return queryset
+
+    def check_organization(self, organization_id, field, message):
+        organization = self.get_organization()
+        if organization and organization_id != organization.pk:
+            raise ValidationError({field: [message]})
+
+    def check_vendor_organization(self, vendor):
+        self.check_organization(vendor.organization_id, 'vendor', 'Vendor does not belong to this organization.')
+
+    def check_assigned_organization(self, validated_data):
+        # Scoped requests may not move a vendor into (or out of) another organization
+        if 'organization' in validated_data:
+            organization = validated_data['organization']
+            self.check_organization(
+                organization.pk if organization else None,
+                'organization',
+                'Vendor can only be assigned to this organization.',
+            )
+
+
+class Organizations(generics.GenericAPIView):
+    queryset = Organization.objects.all()
+    serializer_class = OrganizationSerializer
 
+    def get(self, request, *args, **kwargs):
+        organizations = self.get_queryset()
+        serializer = self.get_serializer(organizations, many=True)
+        return Response(serializer.data)
 
-class Vendors(generics.GenericAPIView):
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+Organizations = Organizations.as_view()
+
+
+class Vendors(OrganizationScopedMixin, generics.GenericAPIView):
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
 
@@ -18,13 +83,18 @@ class Vendors(generics.GenericAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        organization = self.get_organization()
+        if organization:
+            self.check_assigned_organization(serializer.validated_data)
+            serializer.save(organization=organization)
+        else:
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 Vendors = Vendors.as_view()
 
 
-class VendorID(generics.GenericAPIView):
+class VendorID(OrganizationScopedMixin, generics.GenericAPIView):
     queryset = Vendor.objects.all()
     serializer_class = VendorDetailSerializer
     lookup_field = 'vendor_code'
@@ -38,6 +108,7 @@ class VendorID(generics.GenericAPIView):
         vendor = self.get_object()
         serializer = self.get_serializer(vendor, data=request.data)
         serializer.is_valid(raise_exception=True)
+        self.check_assigned_organization(serializer.validated_data)
         serializer.save()
         return Response(serializer.data)
 
@@ -49,7 +120,7 @@ class VendorID(generics.GenericAPIView):
 VendorID = VendorID.as_view()
 
 
-class PurchaseOrders(generics.GenericAPIView):
+class PurchaseOrders(OrganizationScopedMixin, generics.GenericAPIView):
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderSerializer
 
@@ -64,13 +135,14 @@ class PurchaseOrders(generics.GenericAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        self.check_vendor_organization(serializer.validated_data['vendor'])
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 PurchaseOrders = PurchaseOrders.as_view()
 
 
-class PurchaseOrderID(generics.GenericAPIView):
+class PurchaseOrderID(OrganizationScopedMixin, generics.GenericAPIView):
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderDetailSerializer
     lookup_field = 'po_number'
@@ -84,6 +156,7 @@ class PurchaseOrderID(generics.GenericAPIView):
         purchase_order = self.get_object()
         serializer = self.get_serializer(purchase_order, data=request.data)
         serializer.is_valid(raise_exception=True)
+        self.check_vendor_organization(serializer.validated_data['vendor'])
         serializer.save()
         return Response(serializer.data)
 
@@ -95,20 +168,20 @@ class PurchaseOrderID(generics.GenericAPIView):
 PurchaseOrderID = PurchaseOrderID.as_view()
 
 
-class VendorPerformance(generics.GenericAPIView):
+class VendorPerformance(OrganizationScopedMixin, generics.GenericAPIView):
     queryset = HistoricalPerformance.objects.all()
     serializer_class = VendorPerformanceSerializer
 
     def get(self, request, *args, **kwargs):
-        vendor_id = self.kwargs.get('vendor_id')
-        performances = self.queryset.filter(vendor_id=vendor_id)
+        vendor_id = self.kwargs.get('vendor_code')
+        performances = self.get_queryset().filter(vendor_id=vendor_id)
         serializer = self.get_serializer(performances, many=True)
         return Response(serializer.data)
 
 VendorPerformance = VendorPerformance.as_view()
 
 
-class AcknowledgePurchaseOrder(generics.UpdateAPIView):
+class AcknowledgePurchaseOrder(OrganizationScopedMixin, generics.UpdateAPIView):
     queryset = PurchaseOrder.objects.all()
     serializer_class = AcknowledgePurchaseOrderSerializer
     lookup_field = 'po_number'
@@ -122,3 +195,48 @@ class AcknowledgePurchaseOrder(generics.UpdateAPIView):
         return Response(serializer.data)
 
 AcknowledgePurchaseOrder = AcknowledgePurchaseOrder.as_view()
+
+
+class PerformanceAnomalies(OrganizationScopedMixin, generics.GenericAPIView):
+    queryset = PerformanceAnomaly.objects.all()
+    serializer_class = PerformanceAnomalySerializer
+    organization_field = 'vendor__organization_id'
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        vendor_id = self.kwargs.get('vendor_code') or request.query_params.get('vendor_id')
+        if vendor_id:
+            queryset = queryset.filter(vendor_id=vendor_id)
+        metric = request.query_params.get('metric')
+        if metric:
+            queryset = queryset.filter(metric=metric)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+PerformanceAnomalies = PerformanceAnomalies.as_view()
+
+
+class OrderVolume(OrganizationScopedMixin, generics.GenericAPIView):
+    serializer_class = OrderVolumeQuerySerializer
+    list_params = ['group_by', 'vendor_id', 'status']
+
+    def get(self, request, *args, **kwargs):
+        params = {
+            key: value.split(',') if key in self.list_params else value
+            for key, value in request.query_params.items()
+        }
+        serializer = self.get_serializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        rows = query_order_volume(
+            group_by=query.get('group_by', ()),
+            granularity=query['granularity'],
+            vendors=query.get('vendor_id'),
+            statuses=query.get('status'),
+            period_start=query.get('period_start'),
+            period_end=query.get('period_end'),
+            organization=self.get_organization(),
+        )
+        return Response(rows)
+
+OrderVolume = OrderVolume.as_view()